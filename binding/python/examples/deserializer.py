@@ -1,4 +1,7 @@
+import ipaddress
 import pickle
+import struct
+from functools import lru_cache
 from raftify import (
     set_confchange_context_deserializer,
     set_confchangev2_context_deserializer,
@@ -9,16 +12,95 @@ from raftify import (
 )
 
 
-def pickle_deserialize(data: bytes) -> str | None:
-    if data == b"":
+# Raftify stores the response sequence number in the entry context as a bincode u64,
+# which is laid out as 8 little-endian bytes.
+RESPONSE_SEQ_LAYOUT = struct.Struct("<Q")
+
+# The confchange context holds the peer addresses as a bincode Vec<SocketAddr>:
+# a u64 length followed by, per address, a u32 variant tag (0 = V4, 1 = V6),
+# the raw octets and a u16 port. Everything is little-endian.
+ADDRS_LEN_LAYOUT = struct.Struct("<Q")
+ADDR_TAG_LAYOUT = struct.Struct("<I")
+ADDR_LAYOUTS = {
+    0: struct.Struct("<4sH"),
+    1: struct.Struct("<16sH"),
+}
+
+
+# Payload decoders keyed by the leading byte of the payload.
+# Pickle streams of protocol 2 or higher always start with the PROTO opcode,
+# so that byte already serves as their tag.
+PAYLOAD_DECODERS = {
+    pickle.PROTO[0]: pickle.loads,
+}
+
+
+def pickle_deserialize(data: bytes | bytearray | memoryview) -> str | None:
+    # Any buffer is accepted as is, since pickle.loads reads it without copying it to bytes first.
+    if not data:
         return None
 
-    if pickle.PROTO in data:
-        r = pickle.loads(data[data.index(pickle.PROTO) :])
-        return r
+    decoder = PAYLOAD_DECODERS.get(data[0])
 
     # Not pickle data
-    return None
+    if decoder is None:
+        return None
+
+    return decoder(data)
+
+
+# Contexts are small and repeat a lot while the log is replayed,
+# so their decoded values are memoized.
+CONTEXT_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CONTEXT_CACHE_SIZE)
+def entry_context_deserialize(data: bytes) -> int | str | None:
+    """
+    Read the response sequence number straight out of its fixed layout
+    instead of running it through the pickle machine.
+    Falls back to pickle for contexts written in the other formats.
+    """
+
+    if len(data) == RESPONSE_SEQ_LAYOUT.size:
+        return RESPONSE_SEQ_LAYOUT.unpack(data)[0]
+
+    return pickle_deserialize(data)
+
+
+@lru_cache(maxsize=CONTEXT_CACHE_SIZE)
+def message_context_deserialize(data: bytes) -> str | None:
+    return pickle_deserialize(data)
+
+
+def confchange_context_deserialize(data: bytes) -> list[str] | str | None:
+    """
+    Unpack the peer addresses from their fixed-width layout.
+    Falls back to pickle for contexts written in the other formats.
+    """
+
+    try:
+        (count,) = ADDRS_LEN_LAYOUT.unpack_from(data)
+        offset = ADDRS_LEN_LAYOUT.size
+        addrs = []
+
+        for _ in range(count):
+            (tag,) = ADDR_TAG_LAYOUT.unpack_from(data, offset)
+            offset += ADDR_TAG_LAYOUT.size
+
+            layout = ADDR_LAYOUTS[tag]
+            ip, port = layout.unpack_from(data, offset)
+            offset += layout.size
+
+            ip = ipaddress.ip_address(ip)
+            addrs.append(f"{ip}:{port}" if ip.version == 4 else f"[{ip}]:{port}")
+    except (struct.error, KeyError):
+        return pickle_deserialize(data)
+
+    if offset != len(data):
+        return pickle_deserialize(data)
+
+    return addrs
 
 
 def register_custom_deserializer() -> None:
@@ -26,9 +108,9 @@ def register_custom_deserializer() -> None:
     Initialize the custom deserializers.
     """
 
-    set_confchange_context_deserializer(pickle_deserialize)
-    set_confchangev2_context_deserializer(pickle_deserialize)
-    set_entry_context_deserializer(pickle_deserialize)
+    set_confchange_context_deserializer(confchange_context_deserialize)
+    set_confchangev2_context_deserializer(confchange_context_deserialize)
+    set_entry_context_deserializer(entry_context_deserialize)
     set_entry_data_deserializer(pickle_deserialize)
-    set_message_context_deserializer(pickle_deserialize)
+    set_message_context_deserializer(message_context_deserialize)
     set_snapshot_data_deserializer(pickle_deserialize)
@@ -37,7 +37,7 @@ impl PyPeers {
     }
 
     pub fn is_empty(&self) -> bool {
-        self.inner.inner.is_empty()
+        self.inner.is_empty()
     }
 
     pub fn to_dict(&self, py: Python) -> PyResult<PyObject> {
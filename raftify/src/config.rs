@@ -19,6 +19,7 @@ pub struct Config {
 
     pub initial_peers: Option<Peers>,
     pub snapshot_interval: Option<f32>,
+    pub max_requests_per_ready: usize,
 }
 
 impl Config {
@@ -36,6 +37,7 @@ impl Config {
         conf_change_request_timeout: f32,
         initial_peers: Option<Peers>,
         snapshot_interval: Option<f32>,
+        max_requests_per_ready: usize,
     ) -> Self {
         Self {
             raft_config,
@@ -50,6 +52,7 @@ impl Config {
             cluster_id,
             conf_change_request_timeout,
             bootstrap_from_snapshot,
+            max_requests_per_ready,
         }
     }
 }
@@ -94,6 +97,7 @@ impl Default for Config {
             initial_peers: None,
             snapshot_interval: None,
             bootstrap_from_snapshot: false,
+            max_requests_per_ready: 64,
         }
     }
 }
@@ -132,6 +136,7 @@ impl fmt::Debug for Config {
                 lmdb_map_size: {lmdb_map_size}, \
                 cluster_id: {cluster_id}, \
                 conf_change_request_timeout: {conf_change_request_timeout}, \
+                max_requests_per_ready: {max_requests_per_ready}, \
             }}",
             id = self.raft_config.id,
             election_tick = self.raft_config.election_tick,
@@ -160,6 +165,7 @@ impl fmt::Debug for Config {
             cluster_id = self.cluster_id,
             conf_change_request_timeout = self.conf_change_request_timeout,
             bootstrap_from_snapshot = self.bootstrap_from_snapshot,
+            max_requests_per_ready = self.max_requests_per_ready,
         )
     }
 }
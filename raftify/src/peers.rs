@@ -1,3 +1,4 @@
+use bytes::Bytes;
 use serde::{Deserialize, Serialize};
 use std::{
     collections::HashMap,
@@ -8,8 +9,27 @@ use super::Peer;
 use crate::{error::Result, raft_service, InitialRole};
 
 #[derive(Debug, Clone, Deserialize, Serialize)]
+#[serde(from = "SerializedPeers")]
 pub struct Peers {
-    pub inner: HashMap<u64, Peer>,
+    // Not public, so that every change goes through the methods that drop the encoded cache.
+    pub(crate) inner: HashMap<u64, Peer>,
+    // Highest node id added or reserved so far, so reserving an id doesn't scan the peers.
+    #[serde(skip)]
+    last_id: u64,
+    // Bincode encoding of the peers, reused until they change.
+    #[serde(skip)]
+    encoded: Option<Bytes>,
+}
+
+#[derive(Deserialize)]
+struct SerializedPeers {
+    inner: HashMap<u64, Peer>,
+}
+
+impl From<SerializedPeers> for Peers {
+    fn from(peers: SerializedPeers) -> Self {
+        Self::from_inner(peers.inner)
+    }
 }
 
 impl Default for Peers {
@@ -55,7 +75,7 @@ impl From<HashMap<u64, SocketAddr>> for Peers {
             .into_iter()
             .map(|(k, addr)| (k, Peer::new(addr, InitialRole::Voter)))
             .collect();
-        Peers { inner }
+        Peers::from_inner(inner)
     }
 }
 
@@ -63,17 +83,26 @@ impl Peers {
     pub fn new<A: ToSocketAddrs>(self_id: u64, self_addr: A) -> Self {
         let mut inner = HashMap::new();
         inner.insert(self_id, Peer::new(self_addr, InitialRole::Voter));
-        Self { inner }
+        Self::from_inner(inner)
     }
 
     pub fn with_empty() -> Self {
+        Self::from_inner(HashMap::new())
+    }
+
+    fn from_inner(inner: HashMap<u64, Peer>) -> Self {
+        let last_id = inner.keys().max().copied().unwrap_or(0);
         Self {
-            inner: HashMap::new(),
+            inner,
+            last_id,
+            encoded: None,
         }
     }
 
     pub fn replace(&mut self, peers: Peers) {
         self.inner = peers.inner;
+        self.last_id = self.last_id.max(peers.last_id);
+        self.encoded = peers.encoded;
     }
 
     pub fn iter(&self) -> SortedPeersIter {
@@ -87,6 +116,13 @@ impl Peers {
         }
     }
 
+    pub fn encoded(&mut self) -> Bytes {
+        if self.encoded.is_none() {
+            self.encoded = Some(bincode::serialize(self).unwrap().into());
+        }
+        self.encoded.clone().unwrap()
+    }
+
     pub fn to_json(&self) -> String {
         serde_json::to_string(&self.inner).unwrap()
     }
@@ -104,10 +140,12 @@ impl Peers {
     }
 
     pub fn get_mut(&mut self, id: &u64) -> Option<&mut Peer> {
+        self.encoded = None;
         self.inner.get_mut(id)
     }
 
     pub fn remove(&mut self, id: &u64) -> Option<Peer> {
+        self.encoded = None;
         self.inner.remove(id)
     }
 
@@ -121,13 +159,13 @@ impl Peers {
         let initial_role = initial_role.unwrap_or(InitialRole::Voter);
         let peer = Peer::new(addr, initial_role);
         self.inner.insert(id, peer);
+        self.last_id = self.last_id.max(id);
+        self.encoded = None;
     }
 
     pub fn reserve_id(&mut self) -> u64 {
-        match self.inner.keys().max() {
-            Some(id) => id + 1,
-            None => 1,
-        }
+        self.last_id += 1;
+        self.last_id
     }
 
     pub fn get_node_id_by_addr<A: ToSocketAddrs>(&self, addr: A) -> Option<u64> {
@@ -138,8 +176,9 @@ impl Peers {
             .map(|(id, _)| *id)
     }
 
+    // The client isn't part of the encoding, so connecting keeps the cached one unlike get_mut.
     pub async fn connect(&mut self, id: u64) -> Result<()> {
-        let peer = self.get_mut(&id).unwrap();
+        let peer = self.inner.get_mut(&id).unwrap();
         peer.connect().await
     }
 }
@@ -196,4 +235,56 @@ mod tests {
         peers.add_peer(next_id, "127.0.0.1:8085", None);
         assert_eq!(next_id, 5);
     }
+
+    #[test]
+    fn test_peers_reserve_id_is_monotonic() {
+        let mut peers = Peers::new(1, "127.0.0.1:8081");
+        // Reserved ids aren't handed out again, even before they are added.
+        assert_eq!(peers.reserve_id(), 2);
+        assert_eq!(peers.reserve_id(), 3);
+
+        peers.add_peer(7, "127.0.0.1:8087", None);
+        assert_eq!(peers.reserve_id(), 8);
+
+        peers.remove(&7);
+        assert_eq!(peers.reserve_id(), 9);
+    }
+
+    #[test]
+    fn test_peers_last_id_rebuilt_on_deserialize() {
+        let mut peers = Peers::new(1, "127.0.0.1:8081");
+        peers.add_peer(7, "127.0.0.1:8087", None);
+
+        let encoded = bincode::serialize(&peers).unwrap();
+        let mut decoded: Peers = bincode::deserialize(&encoded).unwrap();
+        assert_eq!(decoded.len(), 2);
+        assert_eq!(decoded.reserve_id(), 8);
+    }
+
+    #[test]
+    fn test_peers_encoded_after_change() {
+        let mut peers = Peers::new(1, "127.0.0.1:8081");
+        assert_eq!(peers.encoded(), bincode::serialize(&peers).unwrap());
+
+        peers.add_peer(2, "127.0.0.1:8082", None);
+        assert_eq!(peers.encoded(), bincode::serialize(&peers).unwrap());
+
+        peers.remove(&1);
+        let decoded: Peers = bincode::deserialize(&peers.encoded()).unwrap();
+        assert_eq!(decoded.len(), 1);
+        assert!(decoded.get(&2).is_some());
+    }
+
+    #[tokio::test]
+    async fn test_peers_encoded_after_connect() {
+        let listener = tokio::net::TcpListener::bind("127.0.0.1:0").await.unwrap();
+        let mut peers = Peers::new(1, listener.local_addr().unwrap());
+        let encoded = peers.encoded();
+
+        peers.connect(1).await.unwrap();
+        assert!(peers.get(&1).unwrap().client.is_some());
+
+        // The cached encoding is still the same buffer, not a fresh serialization.
+        assert_eq!(peers.encoded().as_ptr(), encoded.as_ptr());
+    }
 }
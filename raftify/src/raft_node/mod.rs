@@ -18,12 +18,12 @@ use std::{
 };
 use tokio::{
     sync::{mpsc, oneshot, Mutex},
-    time::timeout,
+    time::sleep_until,
 };
-use tonic::Request;
+use tonic::{Code, Request};
 
 use response_sender::ResponseSender;
-use utils::inspect_raftnode;
+use utils::{decode_response_seq, encode_response_seq, inspect_raftnode};
 
 use crate::{
     create_client,
@@ -54,6 +54,39 @@ use crate::{
     RaftServiceClient, StableStorage,
 };
 
+// Keeps a coalesced SendMessages request well below tonic's default 4MB decoding limit.
+// Only a single message larger than this is sent on its own, through SendMessage.
+const MAX_MESSAGE_BATCH_SIZE: usize = 1024 * 1024;
+
+// Caps the data of the consecutive committed entries folded into a single apply.
+const MAX_FOLDED_DATA_SIZE: usize = 1024 * 1024;
+
+// Takes the next batch of queued messages in order. A batch only goes over MAX_MESSAGE_BATCH_SIZE
+// when its first message alone does; a message that doesn't fit is held back to lead the next one.
+async fn next_message_batch(
+    rx_message: &mut mpsc::UnboundedReceiver<RaftMessage>,
+    held_back: &mut Option<RaftMessage>,
+) -> Option<Vec<RaftMessage>> {
+    let message = match held_back.take() {
+        Some(message) => message,
+        None => rx_message.recv().await?,
+    };
+
+    let mut batch_size = message.encoded_len();
+    let mut messages = vec![message];
+
+    while let Ok(message) = rx_message.try_recv() {
+        if batch_size + message.encoded_len() > MAX_MESSAGE_BATCH_SIZE {
+            *held_back = Some(message);
+            break;
+        }
+        batch_size += message.encoded_len();
+        messages.push(message);
+    }
+
+    Some(messages)
+}
+
 #[derive(Clone)]
 pub struct RaftNode<
     LogEntry: AbstractLogEntry + Send + 'static,
@@ -497,6 +530,9 @@ pub struct RaftNodeCore<
     last_snapshot_created: Instant,
     logger: Arc<dyn Logger>,
     response_senders: HashMap<u64, ResponseSender<LogEntry, LogStorage, FSM>>,
+    message_senders: HashMap<u64, mpsc::UnboundedSender<RaftMessage>>,
+    // Conf changes proposed by this node, keyed by the (index, term) of their log entry.
+    proposed_conf_changes: HashMap<(u64, u64), ConfChangeV2>,
 
     #[allow(dead_code)]
     tx_server: mpsc::Sender<ServerRequestMsg<LogEntry, LogStorage, FSM>>,
@@ -599,6 +635,8 @@ impl<
             should_exit: false,
             peers: Arc::new(Mutex::new(peers)),
             response_senders: HashMap::new(),
+            message_senders: HashMap::new(),
+            proposed_conf_changes: HashMap::new(),
             tx_server,
             rx_server,
             tx_local,
@@ -645,6 +683,8 @@ impl<
 
     pub async fn make_snapshot(&mut self, index: u64, term: u64) -> Result<()> {
         self.last_snapshot_created = Instant::now();
+        // The log must only be compacted once the snapshot succeeded,
+        // so the two are deliberately not overlapped.
         let snapshot_data = self.fsm.snapshot().await?;
 
         let last_applied = self.raw_node.raft.raft_log.applied;
@@ -658,35 +698,74 @@ impl<
         inspect_raftnode(&self.raw_node)
     }
 
-    async fn send_message(
-        message: RaftMessage,
+    async fn send_message_batch(
+        node_id: u64,
+        mut messages: Vec<RaftMessage>,
+        batching_supported: &mut Option<bool>,
         peers: Arc<Mutex<Peers>>,
         tx_self: mpsc::Sender<SelfMessage>,
         logger: Arc<dyn Logger>,
     ) {
-        let node_id = message.get_to();
-
         let mut ok = std::result::Result::<(), SendMessageError>::Ok(());
 
-        let client = match peers.lock().await.get_mut(&node_id) {
-            Some(peer) => {
-                if peer.client.is_none() {
-                    if let Err(e) = peer.connect().await {
+        let client = {
+            let mut peers = peers.lock().await;
+            match peers.get(&node_id).map(|peer| peer.client.clone()) {
+                Some(Some(client)) => Some(client),
+                Some(None) => {
+                    if let Err(e) = peers.connect(node_id).await {
                         logger.debug(format!("Connection error: {:?}", e).as_str());
                         ok = Err(SendMessageError::ConnectionError(node_id.to_string()));
                     }
+                    peers.get(&node_id).and_then(|peer| peer.client.clone())
+                }
+                None => {
+                    ok = Err(SendMessageError::PeerNotFound(node_id.to_string()));
+                    None
                 }
-                peer.client.clone()
-            }
-            None => {
-                ok = Err(SendMessageError::PeerNotFound(node_id.to_string()));
-                None
             }
         };
 
         if let Some(mut client) = client {
-            let message = Request::new(message.clone());
-            if let Err(e) = client.send_message(message).await {
+            let mut result = Ok(());
+
+            if messages.len() > 1 && *batching_supported != Some(false) {
+                // Peers running an older raftify don't serve SendMessages. Until the peer is
+                // known to serve it, a copy is kept to resend the messages one by one.
+                let fallback = batching_supported.is_none().then(|| messages.clone());
+                let request = Request::new(raft_service::RaftMessages {
+                    messages: std::mem::take(&mut messages),
+                });
+
+                match client.send_messages(request).await {
+                    Err(status) if status.code() == Code::Unimplemented => {
+                        logger.debug(&format!(
+                            "Node {} doesn't serve SendMessages, sending messages one by one.",
+                            node_id
+                        ));
+                        *batching_supported = Some(false);
+                        match fallback {
+                            Some(fallback) => messages = fallback,
+                            None => result = Err(status),
+                        }
+                    }
+                    sent => {
+                        if sent.is_ok() {
+                            *batching_supported = Some(true);
+                        }
+                        result = sent.map(|_| ());
+                    }
+                }
+            }
+
+            for message in messages {
+                if let Err(e) = client.send_message(Request::new(message)).await {
+                    result = Err(e);
+                    break;
+                }
+            }
+
+            if let Err(e) = result {
                 logger.trace(&format!("Message transmission error: {:?}", e));
                 ok = Err(SendMessageError::TransmissionError(node_id.to_string()));
             }
@@ -700,32 +779,137 @@ impl<
         }
     }
 
+    /// Long-lived writer for a single peer.
+    /// Sends the queued messages in order, coalescing the ones queued meanwhile into one RPC.
+    async fn run_message_sender(
+        node_id: u64,
+        mut rx_message: mpsc::UnboundedReceiver<RaftMessage>,
+        peers: Arc<Mutex<Peers>>,
+        tx_self: mpsc::Sender<SelfMessage>,
+        logger: Arc<dyn Logger>,
+    ) {
+        let mut held_back = None;
+
+        // Whether the peer serves SendMessages, unknown until the first coalesced batch is sent.
+        let mut batching_supported = None;
+
+        while let Some(messages) = next_message_batch(&mut rx_message, &mut held_back).await {
+            RaftNodeCore::<LogEntry, LogStorage, FSM>::send_message_batch(
+                node_id,
+                messages,
+                &mut batching_supported,
+                peers.clone(),
+                tx_self.clone(),
+                logger.clone(),
+            )
+            .await;
+        }
+    }
+
     async fn send_messages(&mut self, messages: Vec<RaftMessage>) {
         for message in messages {
-            tokio::spawn(RaftNodeCore::<LogEntry, LogStorage, FSM>::send_message(
-                message,
-                self.peers.clone(),
-                self.tx_self.clone(),
-                self.logger.clone(),
-            ));
+            let node_id = message.get_to();
+
+            let tx_message = self.message_senders.entry(node_id).or_insert_with(|| {
+                let (tx_message, rx_message) = mpsc::unbounded_channel();
+                tokio::spawn(
+                    RaftNodeCore::<LogEntry, LogStorage, FSM>::run_message_sender(
+                        node_id,
+                        rx_message,
+                        self.peers.clone(),
+                        self.tx_self.clone(),
+                        self.logger.clone(),
+                    ),
+                );
+                tx_message
+            });
+
+            // The writer only stops once its sender is dropped, so this cannot fail.
+            let _ = tx_message.send(message);
         }
     }
 
-    async fn handle_committed_entries(&mut self, committed_entries: Vec<Entry>) -> Result<()> {
-        for entry in committed_entries {
+    async fn handle_committed_entries(
+        &mut self,
+        committed_entries: Vec<Entry>,
+        now: Instant,
+    ) -> Result<()> {
+        // Proposers are answered after the whole batch is applied,
+        // and at most one periodic snapshot is taken per batch.
+        let mut applied_senders = vec![];
+        let mut applied_normal_entry = false;
+        let mut last_committed = None;
+        // Consecutive normal entries the state machine could fold together, not applied yet.
+        let mut pending_data = None;
+
+        for mut entry in committed_entries {
+            // Conf changes and empty entries count too, since the snapshot carries
+            // the conf state they left in the storage.
+            last_committed = Some((entry.index, entry.term));
+
             match entry.get_entry_type() {
                 EntryType::EntryNormal => {
                     if entry.get_data().is_empty() {
                         continue;
                     }
 
-                    self.handle_committed_normal_entry(&entry).await?;
+                    if let Some(sender) = self
+                        .handle_committed_normal_entry(&mut entry, &mut pending_data)
+                        .await?
+                    {
+                        applied_senders.push(sender);
+                    }
+                    applied_normal_entry = true;
                 }
                 EntryType::EntryConfChange | EntryType::EntryConfChangeV2 => {
+                    if let Some(data) = pending_data.take() {
+                        self.fsm.apply(data).await?;
+                    }
                     self.handle_committed_config_change_entry(&entry).await?;
                 }
             }
         }
+
+        if let Some(data) = pending_data {
+            self.fsm.apply(data).await?;
+        }
+
+        // A proposed conf change whose index got committed with another entry,
+        // e.g. after a leader change, will never be looked up anymore.
+        if let Some((last_index, _)) = last_committed {
+            self.proposed_conf_changes
+                .retain(|&(index, _), _| index > last_index);
+        }
+
+        for sender in applied_senders {
+            match sender {
+                ResponseSender::Local(tx_local) => {
+                    tx_local
+                        .send(LocalResponseMsg::Propose {
+                            result: ResponseResult::Success,
+                        })
+                        .unwrap();
+                }
+                ResponseSender::Server(tx_server) => {
+                    tx_server
+                        .send(ServerResponseMsg::Propose {
+                            result: ResponseResult::Success,
+                        })
+                        .unwrap();
+                }
+            }
+        }
+
+        if let (Some(snapshot_interval), Some((index, term))) =
+            (self.config.snapshot_interval, last_committed)
+        {
+            if applied_normal_entry
+                && now > self.last_snapshot_created + Duration::from_secs_f32(snapshot_interval)
+            {
+                self.make_snapshot(index, term).await?;
+            }
+        }
+
         Ok(())
     }
 
@@ -753,14 +937,11 @@ impl<
         cc_v2.set_changes(changes);
         cc_v2.set_context(serialize(&addrs)?);
 
-        let cc_v2: ConfChangeRequest = cc_v2.clone().into();
+        let cc_v2: ConfChangeRequest = cc_v2.into();
         let cc_v2: raft_service::ChangeConfigArgs = cc_v2.into();
 
         let mut leader_client = RaftServiceClient::connect(format!("http://{}", peer_addr)).await?;
-        let response = leader_client
-            .change_config(cc_v2.clone())
-            .await?
-            .into_inner();
+        let response = leader_client.change_config(cc_v2).await?.into_inner();
 
         match response.result_type() {
             ChangeConfigResultType::ChangeConfigSuccess => Ok(()),
@@ -776,62 +957,60 @@ impl<
         }
     }
 
-    async fn handle_committed_normal_entry(&mut self, entry: &Entry) -> Result<()> {
-        let response_seq: u64 = deserialize(entry.get_context())?;
-        let _data = self.fsm.apply(entry.get_data().to_vec()).await?;
-
-        if let Some(sender) = self.response_senders.remove(&response_seq) {
-            match sender {
-                ResponseSender::Local(tx_local) => {
-                    tx_local
-                        .send(LocalResponseMsg::Propose {
-                            result: ResponseResult::Success,
-                        })
-                        .unwrap();
-                }
-                ResponseSender::Server(tx_server) => {
-                    tx_server
-                        .send(ServerResponseMsg::Propose {
-                            result: ResponseResult::Success,
-                        })
-                        .unwrap();
+    async fn handle_committed_normal_entry(
+        &mut self,
+        entry: &mut Entry,
+        pending_data: &mut Option<Vec<u8>>,
+    ) -> Result<Option<ResponseSender<LogEntry, LogStorage, FSM>>> {
+        let response_seq = decode_response_seq(entry.get_context())?;
+        // The committed entry is dropped afterwards, so its data is moved out instead of copied.
+        let data = std::mem::take(&mut entry.data);
+
+        let data = match pending_data.take() {
+            Some(mut pending) => {
+                if pending.len() + data.len() <= MAX_FOLDED_DATA_SIZE
+                    && self.fsm.try_combine(&mut pending, &data)
+                {
+                    pending
+                } else {
+                    self.fsm.apply(pending).await?;
+                    data
                 }
             }
-        }
+            None => data,
+        };
+        *pending_data = Some(data);
 
-        if let Some(snapshot_interval) = self.config.snapshot_interval {
-            if Instant::now()
-                > self.last_snapshot_created + Duration::from_secs_f32(snapshot_interval)
-            {
-                self.make_snapshot(entry.index, entry.term).await?;
-            }
+        Ok(self.response_senders.remove(&response_seq))
+    }
+
+    fn take_committed_conf_change(&mut self, entry: &Entry) -> Result<ConfChangeV2> {
+        // The same index and term always identify the same entry,
+        // so a conf change proposed by this node doesn't have to be decoded again.
+        if let Some(conf_change_v2) = self
+            .proposed_conf_changes
+            .remove(&(entry.index, entry.term))
+        {
+            return Ok(conf_change_v2);
         }
 
-        Ok(())
+        Ok(match entry.get_entry_type() {
+            EntryType::EntryConfChange => to_confchange_v2(ConfChange::decode(entry.get_data())?),
+            EntryType::EntryConfChangeV2 => ConfChangeV2::decode(entry.get_data())?,
+            _ => unreachable!(),
+        })
     }
 
     async fn handle_committed_config_change_entry(&mut self, entry: &Entry) -> Result<()> {
-        if entry.get_context().is_empty() {
-            let conf_change_v2 = match entry.get_entry_type() {
-                EntryType::EntryConfChange => {
-                    to_confchange_v2(ConfChange::decode(entry.get_data())?)
-                }
-                EntryType::EntryConfChangeV2 => ConfChangeV2::decode(entry.get_data())?,
-                _ => unreachable!(),
-            };
+        let conf_change_v2 = self.take_committed_conf_change(entry)?;
 
+        if entry.get_context().is_empty() {
             let cs = self.raw_node.apply_conf_change(&conf_change_v2)?;
             let store = self.raw_node.mut_store();
             store.set_conf_state(&cs)?;
             return Ok(());
         }
 
-        let conf_change_v2 = match entry.get_entry_type() {
-            EntryType::EntryConfChange => to_confchange_v2(ConfChange::decode(entry.get_data())?),
-            EntryType::EntryConfChangeV2 => ConfChangeV2::decode(entry.get_data())?,
-            _ => unreachable!(),
-        };
-
         let conf_changes = conf_change_v2.get_changes();
         let addrs: Vec<SocketAddr> = deserialize(conf_change_v2.get_context())?;
 
@@ -871,6 +1050,7 @@ impl<
                         self.logger
                             .info(&format!("Node {} removed from the cluster.", node_id));
                         self.peers.lock().await.remove(&node_id);
+                        self.message_senders.remove(&node_id);
                     }
                 }
             }
@@ -890,11 +1070,9 @@ impl<
             }
         }
 
-        let response_seq: AtomicU64 = deserialize(entry.get_context())?;
-
-        let response_seq_value = response_seq.load(Ordering::Relaxed);
+        let response_seq = decode_response_seq(entry.get_context())?;
 
-        if let Some(sender) = self.response_senders.remove(&response_seq_value) {
+        if let Some(sender) = self.response_senders.remove(&response_seq) {
             #[allow(unused_assignments)]
             let mut response = ConfChangeResponseResult::Error(Error::Unknown);
 
@@ -987,7 +1165,8 @@ impl<
                 }
             };
 
-            self.raw_node.propose(serialize(&response_seq)?, proposal)?;
+            self.raw_node
+                .propose(encode_response_seq(response_seq), proposal)?;
         }
 
         Ok(())
@@ -1052,7 +1231,11 @@ impl<
             ));
 
             self.raw_node
-                .propose_conf_change(serialize(&response_seq).unwrap(), conf_change)?;
+                .propose_conf_change(encode_response_seq(response_seq), conf_change.clone())?;
+
+            let index = self.raw_node.raft.raft_log.last_index();
+            self.proposed_conf_changes
+                .insert((index, self.raw_node.raft.term), conf_change);
         }
 
         Ok(())
@@ -1160,16 +1343,16 @@ impl<
                 tx_msg.send(LocalResponseMsg::Demote {}).unwrap();
             }
             LocalRequestMsg::Leave { tx_msg } => {
-                let mut conf_change = ConfChange::default();
-                conf_change.set_node_id(self.get_id());
-                conf_change.set_change_type(ConfChangeType::RemoveNode);
+                let mut cs = ConfChangeSingle::default();
+                cs.set_node_id(self.get_id());
+                cs.set_change_type(ConfChangeType::RemoveNode);
+
+                let mut conf_change = ConfChangeV2::default();
+                conf_change.set_changes(vec![cs]);
                 conf_change.set_context(serialize(&vec![self.raft_addr]).unwrap());
 
-                self.handle_confchange_request(
-                    to_confchange_v2(conf_change),
-                    ResponseSender::Local(tx_msg),
-                )
-                .await?;
+                self.handle_confchange_request(conf_change, ResponseSender::Local(tx_msg))
+                    .await?;
             }
             LocalRequestMsg::ChangeConfig {
                 conf_change,
@@ -1297,7 +1480,7 @@ impl<
                             result: RequestIdResponseResult::Success {
                                 reserved_id,
                                 leader_id: self.get_id(),
-                                peers: peers.clone(),
+                                peers: peers.encoded(),
                             },
                         })
                         .unwrap();
@@ -1316,9 +1499,10 @@ impl<
                     .unwrap();
             }
             ServerRequestMsg::GetPeers { tx_msg } => {
+                // Serialize under the lock rather than cloning the peers (and their clients) first.
                 tx_msg
                     .send(ServerResponseMsg::GetPeers {
-                        peers: self.get_peers().await,
+                        peers_json: self.peers.lock().await.to_json(),
                     })
                     .unwrap();
             }
@@ -1341,9 +1525,9 @@ impl<
     }
 
     pub async fn run(mut self) -> Result<()> {
-        let mut tick_timer = Duration::from_secs_f32(self.config.tick_interval);
-        let fixed_tick_timer = tick_timer;
-        let mut now = Instant::now();
+        let tick_interval = Duration::from_secs_f32(self.config.tick_interval);
+        let max_requests_per_ready = self.config.max_requests_per_ready;
+        let mut next_tick = Instant::now() + tick_interval;
 
         loop {
             if self.should_exit {
@@ -1352,38 +1536,55 @@ impl<
                 return Ok(());
             }
 
-            tokio::select! {
-                msg = timeout(fixed_tick_timer, self.rx_self.recv()) => {
-                    if let Ok(Some(msg)) = msg {
+            // Only wait on the channels (bounded by the next tick) when nothing is queued yet.
+            if let Ok(msg) = self.rx_self.try_recv() {
+                self.handle_self_message(msg).await?;
+            } else if let Ok(msg) = self.rx_server.try_recv() {
+                self.handle_server_request_msg(msg).await?;
+            } else if let Ok(msg) = self.rx_local.try_recv() {
+                self.handle_local_request_msg(msg).await?;
+            } else {
+                tokio::select! {
+                    Some(msg) = self.rx_self.recv() => {
                         self.handle_self_message(msg).await?;
                     }
-                }
-                msg = timeout(fixed_tick_timer, self.rx_server.recv()) => {
-                    if let Ok(Some(msg)) = msg {
+                    Some(msg) = self.rx_server.recv() => {
                         self.handle_server_request_msg(msg).await?;
                     }
-                }
-                msg = timeout(fixed_tick_timer, self.rx_local.recv()) => {
-                    if let Ok(Some(msg)) = msg {
+                    Some(msg) = self.rx_local.recv() => {
                         self.handle_local_request_msg(msg).await?;
                     }
+                    _ = sleep_until(next_tick.into()) => {}
+                }
+            }
+
+            // Handle the requests already queued as well,
+            // so that a burst of proposals is persisted by a single ready.
+            for _ in 1..max_requests_per_ready {
+                if self.should_exit {
+                    break;
+                }
+
+                if let Ok(msg) = self.rx_server.try_recv() {
+                    self.handle_server_request_msg(msg).await?;
+                } else if let Ok(msg) = self.rx_local.try_recv() {
+                    self.handle_local_request_msg(msg).await?;
+                } else {
+                    break;
                 }
             }
 
-            let elapsed = now.elapsed();
-            now = Instant::now();
-            if elapsed > tick_timer {
-                tick_timer = fixed_tick_timer;
+            let now = Instant::now();
+            if now >= next_tick {
+                next_tick = now + tick_interval;
                 self.raw_node.tick();
-            } else {
-                tick_timer -= elapsed;
             }
 
-            self.on_ready().await?
+            self.on_ready(now).await?
         }
     }
 
-    async fn on_ready(&mut self) -> Result<()> {
+    async fn on_ready(&mut self, now: Instant) -> Result<()> {
         if !self.raw_node.has_ready() {
             return Ok(());
         }
@@ -1404,18 +1605,13 @@ impl<
             store.apply_snapshot(snapshot.clone())?;
         }
 
-        self.handle_committed_entries(ready.take_committed_entries())
+        self.handle_committed_entries(ready.take_committed_entries(), now)
             .await?;
 
-        if !ready.entries().is_empty() {
+        if !ready.entries().is_empty() || ready.hs().is_some() {
             let entries = &ready.entries()[..];
             let store = self.raw_node.mut_store();
-            store.append(entries)?;
-        }
-
-        if let Some(hs) = ready.hs() {
-            let store = self.raw_node.mut_store();
-            store.set_hard_state(hs)?;
+            store.append_with_hard_state(entries, ready.hs())?;
         }
 
         if !ready.persisted_messages().is_empty() {
@@ -1433,7 +1629,7 @@ impl<
             self.send_messages(light_rd.take_messages()).await;
         }
 
-        self.handle_committed_entries(light_rd.take_committed_entries())
+        self.handle_committed_entries(light_rd.take_committed_entries(), now)
             .await?;
 
         self.raw_node.advance_apply();
@@ -1441,3 +1637,314 @@ impl<
         Ok(())
     }
 }
+
+#[cfg(all(test, feature = "heed_storage"))]
+mod tests {
+    use std::sync::Mutex as StdMutex;
+    use tonic::async_trait;
+
+    use super::*;
+    use crate::{
+        raft::{default_logger, logger::Slogger, Config as RaftConfig},
+        HeedStorage,
+    };
+
+    #[derive(Clone)]
+    struct TestLogEntry;
+
+    impl AbstractLogEntry for TestLogEntry {
+        fn encode(&self) -> Result<Vec<u8>> {
+            Ok(vec![])
+        }
+
+        fn decode(_bytes: &[u8]) -> Result<Self> {
+            Ok(Self)
+        }
+    }
+
+    // Records every apply call, and folds any two entries by appending one to the other.
+    #[derive(Clone, Default)]
+    struct FoldingStore(Arc<StdMutex<Vec<Vec<u8>>>>);
+
+    #[async_trait]
+    impl AbstractStateMachine for FoldingStore {
+        async fn apply(&mut self, data: Vec<u8>) -> Result<Vec<u8>> {
+            self.0.lock().unwrap().push(data.clone());
+            Ok(data)
+        }
+
+        async fn snapshot(&self) -> Result<Vec<u8>> {
+            Ok(vec![])
+        }
+
+        async fn restore(&mut self, _snapshot: Vec<u8>) -> Result<()> {
+            Ok(())
+        }
+
+        fn try_combine(&self, pending: &mut Vec<u8>, next: &[u8]) -> bool {
+            pending.extend_from_slice(next);
+            true
+        }
+
+        fn encode(&self) -> Result<Vec<u8>> {
+            Ok(vec![])
+        }
+
+        fn decode(_bytes: &[u8]) -> Result<Self> {
+            Ok(Self::default())
+        }
+    }
+
+    fn new_normal_entry(index: u64, data: &[u8]) -> Entry {
+        let mut entry = Entry::default();
+        entry.index = index;
+        entry.term = 1;
+        entry.set_entry_type(EntryType::EntryNormal);
+        entry.data = data.to_vec();
+        entry.context = encode_response_seq(index);
+        entry
+    }
+
+    fn new_add_learner_conf_change(node_id: u64) -> ConfChangeV2 {
+        let mut cs = ConfChangeSingle::default();
+        cs.set_node_id(node_id);
+        cs.set_change_type(ConfChangeType::AddLearnerNode);
+
+        let mut conf_change = ConfChangeV2::default();
+        conf_change.set_changes(vec![cs]);
+        conf_change
+    }
+
+    fn new_add_learner_entry(index: u64, node_id: u64) -> Entry {
+        let conf_change = new_add_learner_conf_change(node_id);
+
+        let mut entry = Entry::default();
+        entry.index = index;
+        entry.term = 1;
+        entry.set_entry_type(EntryType::EntryConfChangeV2);
+        entry.data = conf_change.encode_to_vec();
+        entry
+    }
+
+    fn build_core(log_dir: &str) -> RaftNodeCore<TestLogEntry, HeedStorage, FoldingStore> {
+        let config = Config {
+            raft_config: RaftConfig {
+                id: 1,
+                ..Default::default()
+            },
+            log_dir: log_dir.to_owned(),
+            save_compacted_logs: false,
+            compacted_log_dir: log_dir.to_owned(),
+            ..Default::default()
+        };
+        let logger: Arc<dyn Logger> = Arc::new(Slogger {
+            slog: default_logger(),
+        });
+        let storage = HeedStorage::create(log_dir, &config, logger.clone()).unwrap();
+
+        let (tx_server, rx_server) = mpsc::channel(100);
+        let (tx_local, rx_local) = mpsc::channel(100);
+        RaftNodeCore::bootstrap(
+            1,
+            true,
+            storage,
+            FoldingStore::default(),
+            config,
+            "127.0.0.1:60061".parse().unwrap(),
+            logger,
+            tx_server,
+            rx_server,
+            tx_local,
+            rx_local,
+        )
+        .unwrap()
+    }
+
+    #[tokio::test]
+    async fn test_committed_entries_are_folded_until_conf_change() {
+        let tempdir = tempfile::tempdir().unwrap();
+        let mut core = build_core(tempdir.path().to_str().unwrap());
+        let store = core.fsm.clone();
+
+        let mut rx_responses = vec![];
+        for response_seq in [1, 2, 4, 5] {
+            let (tx, rx) = oneshot::channel();
+            core.response_senders
+                .insert(response_seq, ResponseSender::Local(tx));
+            rx_responses.push(rx);
+        }
+
+        let committed_entries = vec![
+            new_normal_entry(1, b"a"),
+            new_normal_entry(2, b"b"),
+            new_add_learner_entry(3, 2),
+            new_normal_entry(4, b"c"),
+            new_normal_entry(5, b"d"),
+        ];
+        core.handle_committed_entries(committed_entries, Instant::now())
+            .await
+            .unwrap();
+
+        // Each run of folded entries is applied once, and the conf change splits the runs.
+        assert_eq!(
+            *store.0.lock().unwrap(),
+            vec![b"ab".to_vec(), b"cd".to_vec()]
+        );
+        assert_eq!(
+            core.raw_node.store().conf_state().unwrap().learners,
+            vec![2]
+        );
+
+        // Every folded proposer is still answered.
+        for mut rx in rx_responses {
+            assert!(matches!(
+                rx.try_recv().unwrap(),
+                LocalResponseMsg::Propose {
+                    result: ResponseResult::Success
+                }
+            ));
+        }
+    }
+
+    #[tokio::test]
+    async fn test_committed_entries_folding_is_capped() {
+        let tempdir = tempfile::tempdir().unwrap();
+        let mut core = build_core(tempdir.path().to_str().unwrap());
+        let store = core.fsm.clone();
+
+        let large = vec![0; MAX_FOLDED_DATA_SIZE / 2 + 1];
+        let committed_entries = vec![
+            new_normal_entry(1, &large),
+            new_normal_entry(2, &large),
+            new_normal_entry(3, b"c"),
+        ];
+        core.handle_committed_entries(committed_entries, Instant::now())
+            .await
+            .unwrap();
+
+        // The second entry would push the run over the cap, so it starts a new one.
+        let applied = store.0.lock().unwrap();
+        assert_eq!(applied.len(), 2);
+        assert_eq!(applied[0], large);
+        assert_eq!(applied[1], [&large[..], b"c"].concat());
+    }
+
+    #[tokio::test]
+    async fn test_committed_conf_change_is_taken_from_proposed() {
+        let tempdir = tempfile::tempdir().unwrap();
+        let mut core = build_core(tempdir.path().to_str().unwrap());
+
+        // The cached conf change differs from the entry data, so only a cache hit adds node 3.
+        core.proposed_conf_changes
+            .insert((1, 1), new_add_learner_conf_change(3));
+
+        core.handle_committed_entries(vec![new_add_learner_entry(1, 2)], Instant::now())
+            .await
+            .unwrap();
+
+        assert_eq!(
+            core.raw_node.store().conf_state().unwrap().learners,
+            vec![3]
+        );
+        assert!(core.proposed_conf_changes.is_empty());
+    }
+
+    #[tokio::test]
+    async fn test_committed_conf_change_is_decoded_without_proposed() {
+        let tempdir = tempfile::tempdir().unwrap();
+        let mut core = build_core(tempdir.path().to_str().unwrap());
+
+        // Proposed in another term, so it isn't the committed entry.
+        core.proposed_conf_changes
+            .insert((1, 2), new_add_learner_conf_change(3));
+
+        core.handle_committed_entries(vec![new_add_learner_entry(1, 2)], Instant::now())
+            .await
+            .unwrap();
+
+        assert_eq!(
+            core.raw_node.store().conf_state().unwrap().learners,
+            vec![2]
+        );
+        assert!(core.proposed_conf_changes.is_empty());
+    }
+
+    #[tokio::test]
+    async fn test_proposed_conf_changes_are_pruned_on_commit() {
+        let tempdir = tempfile::tempdir().unwrap();
+        let mut core = build_core(tempdir.path().to_str().unwrap());
+
+        for index in 1..=3 {
+            core.proposed_conf_changes
+                .insert((index, 2), new_add_learner_conf_change(3));
+        }
+
+        // Only normal entries get committed, which still prunes the cache up to their index.
+        core.handle_committed_entries(
+            vec![new_normal_entry(1, b"a"), new_normal_entry(2, b"b")],
+            Instant::now(),
+        )
+        .await
+        .unwrap();
+
+        assert_eq!(
+            core.proposed_conf_changes.keys().collect::<Vec<_>>(),
+            vec![&(3, 2)]
+        );
+    }
+
+    fn new_append_message(commit: u64, data_size: usize) -> RaftMessage {
+        let mut message = RaftMessage::default();
+        message.to = 2;
+        message.commit = commit;
+        message.entries = vec![new_normal_entry(commit, &vec![0; data_size])];
+        message
+    }
+
+    #[tokio::test]
+    async fn test_message_batch_keeps_order() {
+        let (tx_message, mut rx_message) = mpsc::unbounded_channel();
+        for commit in 1..=3 {
+            tx_message.send(new_append_message(commit, 1)).unwrap();
+        }
+        drop(tx_message);
+
+        let mut held_back = None;
+        let batch = next_message_batch(&mut rx_message, &mut held_back)
+            .await
+            .unwrap();
+        let commits = batch.iter().map(|m| m.commit).collect::<Vec<_>>();
+
+        assert_eq!(commits, vec![1, 2, 3]);
+        assert!(held_back.is_none());
+        assert!(next_message_batch(&mut rx_message, &mut held_back)
+            .await
+            .is_none());
+    }
+
+    #[tokio::test]
+    async fn test_message_batch_holds_back_overflowing_message() {
+        let large = MAX_MESSAGE_BATCH_SIZE / 2 + 1;
+        let (tx_message, mut rx_message) = mpsc::unbounded_channel();
+        tx_message.send(new_append_message(1, large)).unwrap();
+        tx_message.send(new_append_message(2, large)).unwrap();
+        tx_message.send(new_append_message(3, 1)).unwrap();
+        drop(tx_message);
+
+        let mut held_back = None;
+        let batch = next_message_batch(&mut rx_message, &mut held_back)
+            .await
+            .unwrap();
+        assert_eq!(batch.iter().map(|m| m.commit).collect::<Vec<_>>(), vec![1]);
+        assert_eq!(held_back.as_ref().map(|m| m.commit), Some(2));
+
+        let batch = next_message_batch(&mut rx_message, &mut held_back)
+            .await
+            .unwrap();
+        assert_eq!(
+            batch.iter().map(|m| m.commit).collect::<Vec<_>>(),
+            vec![2, 3]
+        );
+        assert!(held_back.is_none());
+    }
+}
@@ -3,11 +3,26 @@ use std::collections::HashMap;
 
 use crate::{
     raft::{formatter::format_snapshot, RawNode},
-    Result, StableStorage,
+    Error, Result, StableStorage,
 };
 
 static EXPECTED_FORMAT_NOT_EXIST: &str = "Expected format not exist!";
 
+// The response sequence number is kept in the entry context as 8 little-endian bytes,
+// which is the same layout bincode uses for u64, so existing logs remain readable.
+pub(crate) fn encode_response_seq(response_seq: u64) -> Vec<u8> {
+    response_seq.to_le_bytes().to_vec()
+}
+
+// Unlike bincode, which ignores any trailing bytes, a context that isn't exactly 8 bytes
+// is rejected, so that a context written in some other format isn't misread as a seq.
+pub(crate) fn decode_response_seq(context: &[u8]) -> Result<u64> {
+    let bytes: [u8; 8] = context.try_into().map_err(|_| {
+        Error::DecodingError(format!("Invalid response seq context: {:?}", context))
+    })?;
+    Ok(u64::from_le_bytes(bytes))
+}
+
 pub fn format_debugging_info(hashmap: &HashMap<String, Value>) -> String {
     let node_id = hashmap
         .get("node_id")
@@ -173,3 +188,27 @@ pub fn inspect_raftnode<T: StableStorage>(raw_node: &RawNode<T>) -> Result<Strin
 
     Ok(result.to_string())
 }
+
+#[cfg(test)]
+mod tests {
+    use super::{decode_response_seq, encode_response_seq};
+
+    #[test]
+    fn test_response_seq_matches_bincode() {
+        for response_seq in [0, 1, 255, 256, u32::MAX as u64 + 1, u64::MAX] {
+            let encoded = bincode::serialize(&response_seq).unwrap();
+            assert_eq!(encode_response_seq(response_seq), encoded);
+            assert_eq!(decode_response_seq(&encoded).unwrap(), response_seq);
+        }
+    }
+
+    #[test]
+    fn test_response_seq_rejects_other_lengths() {
+        let mut encoded = bincode::serialize(&1u64).unwrap();
+        assert!(decode_response_seq(&encoded[..7]).is_err());
+
+        encoded.push(0);
+        assert!(decode_response_seq(&encoded).is_err());
+        assert!(decode_response_seq(&[]).is_err());
+    }
+}
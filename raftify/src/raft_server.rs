@@ -136,7 +136,7 @@ impl<
                     leader_id,
                     reserved_id,
                     leader_addr: self.raft_addr.to_string(),
-                    peers: serialize(&peers).unwrap(),
+                    peers: peers.to_vec(),
                     ..Default::default()
                 })),
                 RequestIdResponseResult::Error(e) => {
@@ -262,6 +262,27 @@ impl<
         Ok(Response::new(raft_service::Empty {}))
     }
 
+    async fn send_messages(
+        &self,
+        request: Request<raft_service::RaftMessages>,
+    ) -> Result<Response<raft_service::Empty>, Status> {
+        let request_args = request.into_inner();
+        let sender = self.tx.clone();
+        for message in request_args.messages {
+            match sender
+                .send(ServerRequestMsg::SendMessage {
+                    message: Box::new(message),
+                })
+                .await
+            {
+                Ok(_) => (),
+                Err(_) => self.print_send_error(function_name!()),
+            }
+        }
+
+        Ok(Response::new(raft_service::Empty {}))
+    }
+
     async fn propose(
         &self,
         request: Request<raft_service::ProposeArgs>,
@@ -350,10 +371,8 @@ impl<
         let response = rx_msg.await.unwrap();
 
         match response {
-            ServerResponseMsg::GetPeers { peers } => {
-                Ok(Response::new(raft_service::GetPeersResponse {
-                    peers_json: peers.to_json(),
-                }))
+            ServerResponseMsg::GetPeers { peers_json } => {
+                Ok(Response::new(raft_service::GetPeersResponse { peers_json }))
             }
             _ => unreachable!(),
         }
@@ -1,3 +1,5 @@
+use bytes::Bytes;
+
 use crate::{AbstractLogEntry, AbstractStateMachine, Error, Peers, StableStorage};
 
 use super::ResponseMessage;
@@ -28,7 +30,8 @@ pub enum RequestIdResponseResult {
     Success {
         reserved_id: u64,
         leader_id: u64,
-        peers: Peers,
+        // Bincode encoded peers.
+        peers: Bytes,
     },
     Error(Error),
     WrongLeader {
@@ -41,7 +44,7 @@ pub enum RequestIdResponseResult {
 pub enum ServerResponseMsg {
     ReportUnreachable { result: ResponseResult },
     DebugNode { result_json: String },
-    GetPeers { peers: Peers },
+    GetPeers { peers_json: String },
     SetPeers {},
     SendMessage { result: ResponseResult },
     CreateSnapshot {},
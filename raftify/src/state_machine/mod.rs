@@ -8,6 +8,13 @@ pub trait AbstractStateMachine: Clone + Send + Sync {
     async fn snapshot(&self) -> Result<Vec<u8>>;
     async fn restore(&mut self, snapshot: Vec<u8>) -> Result<()>;
 
+    // Folds the next log entry into the pending ones in place, so that the result has the same
+    // effect when applied and runs of committed entries can be applied at once.
+    // Returns false, leaving pending untouched, when they can't be combined, which is the default.
+    fn try_combine(&self, _pending: &mut Vec<u8>, _next: &[u8]) -> bool {
+        false
+    }
+
     fn encode(&self) -> Result<Vec<u8>>;
     fn decode(bytes: &[u8]) -> Result<Self>
     where
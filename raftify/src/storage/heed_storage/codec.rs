@@ -40,9 +40,8 @@ impl BytesEncode<'_> for HeedEntry {
     type EItem = Entry;
 
     fn bytes_encode(item: &Self::EItem) -> std::result::Result<Cow<'_, [u8]>, BoxedError> {
-        let mut bytes = vec![];
-        item.encode(&mut bytes)?;
-        Ok(Cow::Owned(bytes))
+        // Allocate the exact encoded length up front so the entry payload is copied only once.
+        Ok(Cow::Owned(item.encode_to_vec()))
     }
 }
 
@@ -157,6 +157,21 @@ impl StableStorage for HeedStorage {
             .map_err(|e| raft::Error::Store(raft::StorageError::Other(e.into())))?;
         Ok(entries)
     }
+
+    fn append_with_hard_state(
+        &mut self,
+        entries: &[Entry],
+        hard_state: Option<&HardState>,
+    ) -> Result<()> {
+        let store = self.wl();
+        let mut writer = store.env.write_txn()?;
+        store.append(&mut writer, entries)?;
+        if let Some(hard_state) = hard_state {
+            store.set_hard_state(&mut writer, hard_state)?;
+        }
+        writer.commit()?;
+        Ok(())
+    }
 }
 
 impl Storage for HeedStorage {
@@ -549,7 +564,7 @@ mod test {
 
     use crate::raft::{
         default_logger,
-        eraftpb::{Entry, Snapshot},
+        eraftpb::{Entry, HardState, Snapshot},
         logger::Slogger,
         Config as RaftConfig, Error as RaftError, GetEntriesContext, Storage, StorageError,
     };
@@ -929,6 +944,47 @@ mod test {
         teardown(tempdir);
     }
 
+    #[test]
+    fn test_storage_append_with_hard_state() {
+        let tempdir = setup();
+        let cfg = build_config(&tempdir);
+        let logger = Arc::new(Slogger {
+            slog: build_logger(),
+        });
+        let mut storage = HeedStorage::create(&tempdir, &cfg, logger).unwrap();
+        storage
+            .replace_entries(&[new_entry(3, 3), new_entry(4, 4)])
+            .unwrap();
+
+        let mut hard_state = HardState::default();
+        hard_state.term = 5;
+        hard_state.vote = 2;
+        hard_state.commit = 5;
+
+        storage
+            .append_with_hard_state(&[new_entry(5, 5)], Some(&hard_state))
+            .unwrap();
+        assert_eq!(storage.last_index(), Ok(5));
+        assert_eq!(storage.hard_state().unwrap(), hard_state);
+
+        // Without a hard state only the entries are persisted.
+        storage
+            .append_with_hard_state(&[new_entry(6, 5)], None)
+            .unwrap();
+        assert_eq!(storage.last_index(), Ok(6));
+        assert_eq!(storage.hard_state().unwrap(), hard_state);
+
+        // Without entries only the hard state is persisted.
+        hard_state.commit = 6;
+        storage
+            .append_with_hard_state(&[], Some(&hard_state))
+            .unwrap();
+        assert_eq!(storage.last_index(), Ok(6));
+        assert_eq!(storage.hard_state().unwrap(), hard_state);
+
+        teardown(tempdir);
+    }
+
     #[test]
     fn test_storage_apply_snapshot() {
         let tempdir = setup();
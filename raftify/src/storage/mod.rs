@@ -34,4 +34,18 @@ pub trait StableStorage: Storage {
     fn apply_snapshot(&mut self, snapshot: Snapshot) -> Result<()>;
     fn compact(&mut self, index: u64) -> Result<()>;
     fn all_entries(&self) -> raft::Result<Vec<Entry>>;
+
+    /// Persists the entries and the hard state of a ready together.
+    /// Storages that can do both in a single write should override this.
+    fn append_with_hard_state(
+        &mut self,
+        entries: &[Entry],
+        hard_state: Option<&HardState>,
+    ) -> Result<()> {
+        self.append(entries)?;
+        if let Some(hard_state) = hard_state {
+            self.set_hard_state(hard_state)?;
+        }
+        Ok(())
+    }
 }
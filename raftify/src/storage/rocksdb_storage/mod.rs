@@ -13,7 +13,7 @@ use constant::{
 use parking_lot::{RwLock, RwLockReadGuard, RwLockWriteGuard};
 use prost::Message;
 use raft::util::limit_size;
-use rocksdb::{ColumnFamilyDescriptor, Options, DB as RocksDB};
+use rocksdb::{ColumnFamilyDescriptor, Options, WriteBatch, DB as RocksDB};
 use std::cmp::max;
 use std::path::{Path, PathBuf};
 use std::sync::Arc;
@@ -109,6 +109,15 @@ impl StableStorage for RocksDBStorage {
         let entries = store.all_entries()?;
         Ok(entries)
     }
+
+    fn append_with_hard_state(
+        &mut self,
+        entries: &[Entry],
+        hard_state: Option<&HardState>,
+    ) -> Result<()> {
+        let mut store = self.wl();
+        store.append_with_hard_state(entries, hard_state)
+    }
 }
 
 impl Storage for RocksDBStorage {
@@ -193,6 +202,32 @@ impl RocksDBStorageCore {
     }
 
     fn append(&mut self, entries: &[Entry]) -> Result<()> {
+        let mut batch = WriteBatch::default();
+        self.put_entries(&mut batch, entries)?;
+        self.db.write(batch).unwrap();
+        Ok(())
+    }
+
+    // The entries and the hard state go into a single write batch,
+    // so that they are committed atomically with one write.
+    fn append_with_hard_state(
+        &mut self,
+        entries: &[Entry],
+        hard_state: Option<&HardState>,
+    ) -> Result<()> {
+        let mut batch = WriteBatch::default();
+        self.put_entries(&mut batch, entries)?;
+
+        if let Some(hard_state) = hard_state {
+            let cf_handle = self.db.cf_handle(METADATA_CF_KEY).unwrap();
+            batch.put_cf(cf_handle, HARD_STATE_KEY, hard_state.encode_to_vec());
+        }
+
+        self.db.write(batch).unwrap();
+        Ok(())
+    }
+
+    fn put_entries(&self, batch: &mut WriteBatch, entries: &[Entry]) -> Result<()> {
         let cf_handle = self.db.cf_handle(LOG_ENTRY_CF_KEY).unwrap();
 
         if entries.is_empty() {
@@ -211,11 +246,11 @@ impl RocksDBStorageCore {
         for entry in entries {
             last_index = std::cmp::max(entry.index, last_index);
             let index = format_entry_key_string(entry.index.to_string().as_str());
-            self.db
-                .put_cf(cf_handle, index, entry.encode_to_vec())
-                .unwrap();
+            batch.put_cf(cf_handle, index, entry.encode_to_vec());
         }
-        self.set_last_index(last_index)?;
+
+        let cf_handle = self.db.cf_handle(METADATA_CF_KEY).unwrap();
+        batch.put_cf(cf_handle, LAST_INDEX_KEY, last_index.to_string().as_bytes());
         Ok(())
     }
 
@@ -462,9 +497,10 @@ mod test {
     use std::panic::{self, AssertUnwindSafe};
     use std::sync::Arc;
 
+    use super::RocksDBStorage;
     use crate::raft::{
         default_logger,
-        eraftpb::{Entry, Snapshot},
+        eraftpb::{Entry, HardState, Snapshot},
         logger::Slogger,
         Config as RaftConfig, Error as RaftError, GetEntriesContext, Storage, StorageError,
     };
@@ -844,6 +880,43 @@ mod test {
         teardown(tempdir);
     }
 
+    #[test]
+    fn test_storage_append_with_hard_state() {
+        let tempdir = setup();
+        let logger = Arc::new(Slogger {
+            slog: build_logger(),
+        });
+        let mut storage = RocksDBStorage::create(&tempdir, logger).unwrap();
+
+        let mut hard_state = HardState::default();
+        hard_state.term = 1;
+        hard_state.vote = 2;
+        hard_state.commit = 1;
+
+        storage
+            .append_with_hard_state(&[new_entry(1, 1)], Some(&hard_state))
+            .unwrap();
+        assert_eq!(storage.last_index(), Ok(1));
+        assert_eq!(storage.hard_state().unwrap(), hard_state);
+
+        // Without a hard state only the entries are persisted.
+        storage
+            .append_with_hard_state(&[new_entry(2, 1)], None)
+            .unwrap();
+        assert_eq!(storage.last_index(), Ok(2));
+        assert_eq!(storage.hard_state().unwrap(), hard_state);
+
+        // Without entries only the hard state is persisted.
+        hard_state.commit = 2;
+        storage
+            .append_with_hard_state(&[], Some(&hard_state))
+            .unwrap();
+        assert_eq!(storage.last_index(), Ok(2));
+        assert_eq!(storage.hard_state().unwrap(), hard_state);
+
+        teardown(tempdir);
+    }
+
     #[test]
     fn test_storage_apply_snapshot() {
         let tempdir = setup();